@@ -130,6 +130,13 @@ chrome.tabs.onCreated.addListener(reportState);
 // HELPERS
 // --------------------------------------------------
 
+function resultsUrl(query) {
+  return (
+    "https://www.youtube.com/results?search_query=" +
+    encodeURIComponent(query)
+  );
+}
+
 async function relayToContent(msg) {
   try {
     // Find YouTube tabs across all windows
@@ -160,8 +167,14 @@ async function relayToContent(msg) {
       }
     } else {
       console.log("📺 No YouTube tab found, creating one...");
+      // Searches open straight on the results page (skips the home page load)
+      const url =
+        msg.action === "search" && msg.query
+          ? resultsUrl(msg.query)
+          : "https://www.youtube.com";
+
       tab = await chrome.tabs.create({
-        url: "https://www.youtube.com",
+        url: url,
         active: true,
       });
 
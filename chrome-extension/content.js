@@ -56,7 +56,13 @@ chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
       query: msg.query,
     });
 
-    forceSearch(msg.query);
+    // Already on these results (e.g. tab opened on the results URL):
+    // pick the video now instead of reloading the same page
+    if (isResultsFor(msg.query)) {
+      runPhase();
+    } else {
+      forceSearch(msg.query);
+    }
   }
 
   if (msg.action === "pause") pauseVideo();
@@ -68,7 +74,7 @@ chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
 // PHASE EXECUTION (RUNS ON EVERY LOAD)
 // --------------------------------------------------
 
-(async function runPhase() {
+async function runPhase() {
   const state = getState();
   if (!state) return;
 
@@ -121,7 +127,9 @@ chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
 
     clearState();
   }
-})();
+}
+
+runPhase();
 
 // --------------------------------------------------
 // ACTIONS
@@ -136,6 +144,13 @@ function forceSearch(query) {
   location.href = searchUrl;
 }
 
+function isResultsFor(query) {
+  return (
+    location.pathname === "/results" &&
+    new URLSearchParams(location.search).get("search_query") === query
+  );
+}
+
 function pauseVideo() {
   const video = document.querySelector("video");
   if (video && !video.paused) video.pause();
@@ -1,21 +1,35 @@
 import asyncio
 import logging
+import logging.handlers
 import os
+import queue
+import re
 import subprocess
 import time
 import pyaudio
 from ctypes import *
-from contextlib import contextmanager
+from contextlib import aclosing, contextmanager
+from typing import Awaitable, Callable
 
 from src.config import LOG_LEVEL
 
 # -----------------------
 # Logging Setup (Pre-Init)
 # -----------------------
+# Records are queued on the calling thread and written to stderr by a
+# listener thread, so logging never blocks the event loop on I/O
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(
+    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+)
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL, logging.INFO),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
 )
+_log_listener.start()
 
 # Silence noisy third-party libraries
 logging.getLogger("websockets").setLevel(logging.WARNING)
@@ -36,12 +50,32 @@ from src.speaker import speak
 # WebSocket player interface
 from src.player import (
     start_ws_server,
+    prewarm_browser,
     search_and_play,
     play,
     pause,
     next_track,
 )
 
+# Resolved once at import (after .env is loaded by src.config)
+HAS_GOOGLE_CREDENTIALS = bool(
+    os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    or os.getenv("GOOGLE_API_KEY")
+)
+
+# Native PulseAudio client when available; pactl subprocesses otherwise
+try:
+    import pulsectl
+except ImportError:
+    pulsectl = None
+
+# libuv-based event loop when available (faster await/subprocess/socket paths)
+try:
+    import uvloop
+    loop_factory = uvloop.new_event_loop
+except ImportError:
+    loop_factory = None
+
 # -----------------------
 # ALSA error suppression
 # -----------------------
@@ -55,48 +89,114 @@ def py_error_handler(filename, line, function, err, fmt):
 
 c_error_handler = ERROR_HANDLER_FUNC(py_error_handler)
 
+# Loaded once; None when ALSA is unavailable
+try:
+    _asound = cdll.LoadLibrary("libasound.so.2")
+except OSError:
+    _asound = None
+
 @contextmanager
 def no_alsa_err():
-    try:
-        asound = cdll.LoadLibrary("libasound.so.2")
-        asound.snd_lib_error_set_handler(c_error_handler)
+    if _asound is None:
         yield
-        asound.snd_lib_error_set_handler(None)
-    except Exception:
+        return
+
+    _asound.snd_lib_error_set_handler(c_error_handler)
+    try:
         yield
+    finally:
+        _asound.snd_lib_error_set_handler(None)
 
 
 # -----------------------
 # AEC device selection
 # -----------------------
 
-def ensure_echo_cancellation():
+# module-echo-cancel default device names
+AEC_SOURCE = "echo-cancel-source"
+AEC_SINK = "echo-cancel-sink"
+
+# Input device names that indicate an echo-cancelled source
+AEC_NAME_RE = re.compile(r"echo|aec|cancel|webrtc", re.IGNORECASE)
+
+
+async def _pactl(*args: str, check: bool = False) -> str:
+    """Run one pactl command without blocking the event loop."""
+    proc = await asyncio.create_subprocess_exec(
+        "pactl", *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    out, _ = await proc.communicate()
+
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, ["pactl", *args])
+    return out.decode()
+
+
+async def _has_source(name: str) -> bool:
+    # `list short` works on every pactl (get-source-volume needs pactl >= 15);
+    # columns are tab-separated: index, name, driver, spec, state
+    out = await _pactl("list", "short", "sources")
+    return any(
+        line.split("\t")[1:2] == [name] for line in out.splitlines()
+    )
+
+
+def _ensure_aec_native():
+    """ensure_echo_cancellation() over libpulse (pulsectl): no pactl forks."""
+    with pulsectl.Pulse("scrapbot") as pulse:
+        def has_source() -> bool:
+            return any(src.name == AEC_SOURCE for src in pulse.source_list())
+
+        if has_source():
+            logging.info("✅ Echo cancellation module already loaded.")
+        else:
+            logging.info("🛠️ Loading PulseAudio echo cancellation module...")
+            pulse.module_load("module-echo-cancel")
+            # Wait (up to 1 s) for PulseAudio to register the new source
+            for _ in range(10):
+                if has_source():
+                    break
+                time.sleep(0.1)
+            logging.info("✅ Echo cancellation module loaded.")
+
+        logging.info("🔄 Setting default source/sink to echo-cancel...")
+        pulse.source_default_set(AEC_SOURCE)
+        pulse.sink_default_set(AEC_SINK)
+
+
+async def ensure_echo_cancellation():
     """
     Checks if PulseAudio echo-cancel module is loaded.
     If not, attempts to load it.
     """
+    if pulsectl is not None:
+        try:
+            await asyncio.to_thread(_ensure_aec_native)
+        except pulsectl.PulseError as e:
+            logging.warning(f"⚠️ Failed to set up module-echo-cancel ({e}). Is PulseAudio running?")
+        return
+
     try:
-        # Check if module is already loaded
-        output = subprocess.check_output(
-            ["pactl", "list", "modules", "short"], text=True
-        )
-        if "module-echo-cancel" in output:
+        # Look for the module's source instead of scanning every module
+        if await _has_source(AEC_SOURCE):
             logging.info("✅ Echo cancellation module already loaded.")
         else:
             logging.info("🛠️ Loading PulseAudio echo cancellation module...")
-            subprocess.run(
-                ["pactl", "load-module", "module-echo-cancel"],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            # Give PulseAudio a moment to register the new sink/source
-            time.sleep(1.0)
+            await _pactl("load-module", "module-echo-cancel", check=True)
+            # Wait (up to 1 s) for PulseAudio to register the new source
+            for _ in range(10):
+                if await _has_source(AEC_SOURCE):
+                    break
+                await asyncio.sleep(0.1)
             logging.info("✅ Echo cancellation module loaded.")
 
         logging.info("🔄 Setting default source/sink to echo-cancel...")
-        subprocess.run(["pactl", "set-default-source", "echo-cancel-source"], check=False)
-        subprocess.run(["pactl", "set-default-sink", "echo-cancel-sink"], check=False)
+        await asyncio.gather(
+            _pactl("set-default-source", AEC_SOURCE),
+            _pactl("set-default-sink", AEC_SINK),
+        )
 
     except subprocess.CalledProcessError:
         logging.warning("⚠️ Failed to load module-echo-cancel. Is PulseAudio running?")
@@ -125,25 +225,19 @@ def find_aec_input_device(p: pyaudio.PyAudio):
                 "Falling back to auto-detection."
             )
 
-    candidates = []
-
     for i in range(p.get_device_count()):
         info = p.get_device_info_by_index(i)
 
         if info.get("maxInputChannels", 0) < 1:
             continue
 
-        name = info.get("name", "").lower()
-        if any(k in name for k in ("echo", "aec", "cancel", "webrtc")):
-            candidates.append((i, info))
-
-    if candidates:
-        idx, info = candidates[0]
-        logging.info(
-            f"🎧 Using AEC input device: "
-            f"[{idx}] {info['name']} ({int(info['defaultSampleRate'])} Hz)"
-        )
-        return idx, int(info["defaultSampleRate"])
+        # First AEC match wins: stop enumerating
+        if AEC_NAME_RE.search(info.get("name", "")):
+            logging.info(
+                f"🎧 Using AEC input device: "
+                f"[{i}] {info['name']} ({int(info['defaultSampleRate'])} Hz)"
+            )
+            return i, int(info["defaultSampleRate"])
 
     info = p.get_default_input_device_info()
     logging.warning(
@@ -153,6 +247,31 @@ def find_aec_input_device(p: pyaudio.PyAudio):
     return info["index"], int(info["defaultSampleRate"])
 
 
+# -----------------------
+# Intent dispatch
+# -----------------------
+
+async def _search_and_play(intent: reasoner.Intent):
+    if intent.filter:
+        logging.info("▶️ SEARCH + PLAY")
+        await search_and_play(intent.filter)
+
+
+# Intent kind → player action (unknown kinds only get spoken feedback)
+INTENT_HANDLERS: dict[str, Callable[[reasoner.Intent], Awaitable[None]]] = {
+    "play_youtube": _search_and_play,
+    "resume_youtube": lambda intent: play(),
+    "pause_youtube": lambda intent: pause(),
+    "next_youtube": lambda intent: next_track(),
+}
+
+
+def _log_prewarm_error(task: asyncio.Task):
+    """Prewarm is best-effort: log a failure instead of leaving it unretrieved."""
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"⚠️ Browser prewarm failed: {task.exception()}")
+
+
 # -----------------------
 # Main loop
 # -----------------------
@@ -161,20 +280,32 @@ async def main_loop():
     if not PROJECT_ID:
         raise RuntimeError("Missing GCP_PROJECT_ID")
 
-    if not (
-        os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-        or os.getenv("GOOGLE_API_KEY")
-    ):
+    if not HAS_GOOGLE_CREDENTIALS:
         raise RuntimeError("Missing Google credentials")
 
-    await start_ws_server()
+    # pactl probes run while the WS server and Brave come up
+    aec_task = asyncio.create_task(ensure_echo_cancellation())
+
+    try:
+        await start_ws_server()
+    except BaseException:
+        # Don't leave the AEC setup running (or its error unretrieved)
+        aec_task.cancel()
+        await asyncio.gather(aec_task, return_exceptions=True)
+        raise
+
+    # Cold-start Brave while audio initializes, not on the first command.
+    # Fire-and-forget: main_loop holds the reference for its whole lifetime
+    browser_task = asyncio.create_task(prewarm_browser())
+    browser_task.add_done_callback(_log_prewarm_error)
 
     # Ensure AEC is available before initializing PyAudio
-    ensure_echo_cancellation()
+    await aec_task
 
     with no_alsa_err():
         p = pyaudio.PyAudio()
     device_index, native_rate = find_aec_input_device(p)
+    listener.load_wake_sound(p)
 
     stream = p.open(
         format=pyaudio.paInt16,
@@ -183,57 +314,58 @@ async def main_loop():
         input=True,
         input_device_index=device_index,
         frames_per_buffer=FRAME_SIZE,
+        stream_callback=listener.stream_callback,
     )
 
     logging.info("🤖 Scrapbot is active. Say the wake word.")
 
-    await listen_state.allow_global_wake_word()
-    audio_gen = listener.listen(stream, native_rate=native_rate)
+    listen_state.allow_global_wake_word()
+    listener_task = asyncio.create_task(listener.listen(native_rate=native_rate))
 
-    try:
-        async for item in audio_gen:
-            if item != "START_SESSION":
-                continue
+    # A crashed listener would leave events() waiting forever: stop main_loop
+    main_task = asyncio.current_task()
+
+    def _on_listener_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"❌ Listener crashed: {task.exception()!r}")
+            main_task.cancel()
 
-            if not await listen_state.get_global_wake_word():
+    listener_task.add_done_callback(_on_listener_done)
+
+    try:
+        async for _event in listener.events():
+            if not listen_state.global_wake_allowed:
                 continue
 
-            await listen_state.block_global_wake_word()
+            listen_state.block_global_wake_word()
+            listener.drain_events()
             logging.info("🛰️ Listening for command...")
 
-            result = await reasoner.process_voice_command(audio_gen)
+            # Closing the stream ends session buffering as soon as the reasoner returns
+            async with aclosing(listener.audio_stream()) as audio:
+                result = await reasoner.process_voice_command(audio)
             logging.debug(f"📋 Reasoner returned: {result}")
 
-            if isinstance(result, dict):
-                intent = result.get("intent")
-                filter_text = result.get("filter")
-                feedback = result.get("feedback")
-                language = result.get("language", "en")
+            if result is not None:
+                handler = INTENT_HANDLERS.get(result.kind)
+                if handler is not None:
+                    try:
+                        await handler(result)
+                    except Exception as e:
+                        logging.error(f"❌ Player error: {e}")
 
-                try:
-                    if intent == "play_youtube" and filter_text:
-                        logging.info("▶️ SEARCH + PLAY")
-                        await search_and_play(filter_text)
-
-                    elif intent == "resume_youtube":
-                        await play()
-
-                    elif intent == "pause_youtube":
-                        await pause()
-
-                    elif intent == "next_youtube":
-                        await next_track()
-
-                except Exception as e:
-                    logging.error(f"❌ Player error: {e}")
-
-                if feedback:
-                    await speak(feedback, language=language)
+                if result.feedback:
+                    await speak(result.feedback, language=result.language)
 
             logging.info("🔄 Session complete. Re-arming wake word.")
-            await listen_state.allow_global_wake_word()
+            # Hits queued while the session ran are stale: drop them before
+            # reopening the gate, or the loop would replay them at once
+            listener.drain_events()
+            listen_state.allow_global_wake_word()
 
     finally:
+        listener_task.cancel()
+        await asyncio.wait([listener_task])
         try:
             stream.stop_stream()
             stream.close()
@@ -241,9 +373,15 @@ async def main_loop():
             pass
         p.terminate()
 
+        # Exit with the listener's error, as the inline loop used to
+        if not listener_task.cancelled() and listener_task.exception() is not None:
+            raise listener_task.exception()
+
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main_loop())
+        asyncio.run(main_loop(), loop_factory=loop_factory)
     except KeyboardInterrupt:
         logging.info("🛑 Scrapbot stopped by user.")
+    finally:
+        _log_listener.stop()
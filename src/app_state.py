@@ -10,6 +10,7 @@ class BrowserState:
         self.ready = False
         self.last_update = 0
         self._lock = asyncio.Lock()
+        self._updated = asyncio.Event()
 
     async def update(self, **kwargs):
         async with self._lock:
@@ -18,6 +19,18 @@ class BrowserState:
                     setattr(self, k, v)
             self.last_update = time.time()
 
+            # Wake current waiters; later waiters get a fresh event
+            self._updated.set()
+            self._updated = asyncio.Event()
+
+    async def wait_for_update(self, timeout: float) -> bool:
+        """Wait for the next update() or `timeout` seconds, whichever is first."""
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
     async def get_state(self):
         async with self._lock:
             return {
@@ -30,44 +43,34 @@ class BrowserState:
 
 
 class ListenState:
+    # Plain bool flags, written from the event loop and read from other
+    # threads too (stream_callback reads listener_running on PortAudio's
+    # thread). A single bool read/write is atomic under the GIL, so no lock
+    # is needed; anything spanning several fields would need one.
     def __init__(self):
         # Wake-word gate
-        self._global_wake_allowed = True
-        self._wake_lock = asyncio.Lock()
+        self.global_wake_allowed = True
 
-        # Listener run gate (NEW)
-        self._listener_running = True
-        self._listener_lock = asyncio.Lock()
+        # Listener run gate
+        self.listener_running = True
 
     # -------------------------
     # Wake-word control
     # -------------------------
-    async def get_global_wake_word(self) -> bool:
-        async with self._wake_lock:
-            return self._global_wake_allowed
+    def block_global_wake_word(self):
+        self.global_wake_allowed = False
 
-    async def block_global_wake_word(self):
-        async with self._wake_lock:
-            self._global_wake_allowed = False
-
-    async def allow_global_wake_word(self):
-        async with self._wake_lock:
-            self._global_wake_allowed = True
+    def allow_global_wake_word(self):
+        self.global_wake_allowed = True
 
     # -------------------------
     # Listener run control
     # -------------------------
-    async def get_listener_running(self) -> bool:
-        async with self._listener_lock:
-            return self._listener_running
-
-    async def block_listener(self):
-        async with self._listener_lock:
-            self._listener_running = False
+    def block_listener(self):
+        self.listener_running = False
 
-    async def allow_listener(self):
-        async with self._listener_lock:
-            self._listener_running = True
+    def allow_listener(self):
+        self.listener_running = True
 
 
 # Singletons used across modules
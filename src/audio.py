@@ -0,0 +1,232 @@
+import logging
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import soxr
+except ImportError:  # NumPy fallback below
+    soxr = None
+
+# Quickest soxr preset: plenty for 16 kHz wake-word / STT input
+RESAMPLE_QUALITY = "QQ"
+
+# NumPy integer-ratio fallback (e.g. 48 kHz → 16 kHz)
+DECIMATE_TAPS = 24
+DECIMATE_CUTOFF = 0.9375  # fraction of the output Nyquist (7.5 kHz @ 16 kHz)
+
+# -------------------------
+# PCM ring buffer
+# -------------------------
+
+class PCMRing:
+    """
+    Fixed-size int16 ring buffer holding the most recent `size` samples.
+
+    Every sample is mirrored into a second half of the backing array, so
+    the current window is always available as a contiguous zero-copy view
+    regardless of where the write cursor sits.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.filled = 0
+        self._buf = np.zeros(2 * size, dtype=np.int16)
+        self._pos = 0
+
+    @property
+    def full(self) -> bool:
+        return self.filled == self.size
+
+    def write(self, samples: np.ndarray):
+        n = samples.size
+        if n == 0:
+            return
+
+        if n > self.size:
+            samples = samples[-self.size:]
+            n = self.size
+
+        size = self.size
+        pos = self._pos
+        first = min(n, size - pos)
+
+        # Primary half + mirror half
+        self._buf[pos:pos + first] = samples[:first]
+        self._buf[pos + size:pos + size + first] = samples[:first]
+
+        rest = n - first
+        if rest:
+            self._buf[:rest] = samples[first:]
+            self._buf[size:size + rest] = samples[first:]
+
+        self._pos = (pos + n) % size
+        self.filled = min(size, self.filled + n)
+
+    def view(self) -> np.ndarray:
+        """Oldest → newest samples of the full window (no copy)."""
+        return self._buf[self._pos:self._pos + self.size]
+
+    def clear(self):
+        self._pos = 0
+        self.filled = 0
+
+
+class SPSCRing:
+    """
+    Single-producer / single-consumer int16 ring for thread → loop hand-off.
+
+    The producer only advances `_w` and the consumer only `_r` (both are
+    running sample totals), so no lock is needed. If the producer laps the
+    consumer, the oldest audio is skipped on the next read.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._buf = np.zeros(size, dtype=np.int16)
+        self._w = 0
+        self._r = 0
+
+    def __len__(self) -> int:
+        return min(self._w - self._r, self.size)
+
+    def write(self, samples: np.ndarray):
+        n = samples.size
+        if n > self.size:
+            samples = samples[-self.size:]
+
+        # A truncated block still ends where the full one would have
+        m = samples.size
+        pos = (self._w + n - m) % self.size
+        first = min(m, self.size - pos)
+        self._buf[pos:pos + first] = samples[:first]
+        self._buf[:m - first] = samples[first:]
+
+        self._w += n  # publish only after the copy
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Copy up to out.size of the oldest unread samples; return the count."""
+        w = self._w
+        r = max(self._r, w - self.size)  # skip audio the producer overwrote
+        n = min(w - r, out.size)
+
+        pos = r % self.size
+        first = min(n, self.size - pos)
+        out[:first] = self._buf[pos:pos + first]
+        out[first:n] = self._buf[:n - first]
+
+        self._r = r + n
+        return n
+
+    def clear(self):
+        """Consumer side: drop everything written so far."""
+        self._r = self._w
+
+
+# -------------------------
+# Resampling
+# -------------------------
+
+class LinearResampler:
+    """
+    Stateful fixed-ratio linear interpolator (NumPy fallback for soxr).
+
+    Output offsets are computed once per chunk size; the fractional phase
+    and the last input sample carry over between calls, so chunk
+    boundaries stay continuous instead of restarting interpolation.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self._step = src_rate / dst_rate
+        self._phase = 0.0
+        self._prev = 0.0
+        self._ext = np.zeros(1, dtype=np.float32)  # [prev, chunk...]
+        self._offsets = np.zeros(0)
+
+    def __call__(self, data: bytes) -> bytes:
+        x = np.frombuffer(data, dtype=np.int16)
+        n = x.size
+        if n == 0:
+            return b""
+
+        if self._ext.size < n + 1:
+            self._ext = np.empty(n + 1, dtype=np.float32)
+            self._offsets = np.arange(int(n / self._step) + 2) * self._step
+
+        ext = self._ext[:n + 1]
+        ext[0] = self._prev
+        ext[1:] = x
+
+        # Output positions falling inside [prev, last sample)
+        m = max(0, int(np.ceil((n - self._phase) / self._step)))
+        t = self._phase + self._offsets[:m]
+        idx = t.astype(np.int64)
+        frac = (t - idx).astype(np.float32)
+
+        a = ext[idx]
+        out = (a + frac * (ext[idx + 1] - a)).astype(np.int16)
+
+        self._phase += m * self._step - n
+        self._prev = ext[n]
+        return out.tobytes()
+
+
+class FIRDecimator:
+    """
+    Stateful anti-aliased integer decimator (NumPy fallback for soxr).
+
+    A windowed-sinc lowpass is evaluated only at the kept output positions,
+    as one strided matrix-vector product per chunk; filter history and
+    output phase carry over between calls.
+    """
+
+    def __init__(self, factor: int, num_taps: int = DECIMATE_TAPS):
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        taps = np.sinc(DECIMATE_CUTOFF / factor * n) * np.hamming(num_taps)
+
+        self._factor = factor
+        self._taps = (taps / taps.sum()).astype(np.float32)  # symmetric
+        self._hist = np.zeros(num_taps - 1, dtype=np.float32)
+        self._phase = 0  # first window start within [history, chunk]
+
+    def __call__(self, data: bytes) -> bytes:
+        x = np.frombuffer(data, dtype=np.int16)
+        if x.size == 0:
+            return b""
+
+        ext = np.concatenate((self._hist, x.astype(np.float32)))
+        windows = sliding_window_view(ext, self._taps.size)[self._phase::self._factor]
+        out = windows @ self._taps
+
+        # Next window start, relative to the history kept for the next call
+        hist_len = self._hist.size
+        self._phase += len(out) * self._factor - (ext.size - hist_len)
+        self._hist = ext[-hist_len:].copy()
+
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+
+
+def make_resampler(src_rate: int, dst_rate: int):
+    """
+    Return a bytes → bytes int16 mono resampler for a fixed rate pair.
+
+    Uses a persistent soxr stream (SIMD, filter state carried across
+    chunks) when available, else a NumPy FIRDecimator for integer ratios
+    or the LinearResampler.
+    """
+    if src_rate == dst_rate:
+        return lambda data: data
+
+    if soxr is None:
+        logging.warning("⚠️ soxr not installed — using NumPy resampler")
+        if src_rate % dst_rate == 0:
+            return FIRDecimator(src_rate // dst_rate)
+        return LinearResampler(src_rate, dst_rate)
+
+    stream = soxr.ResampleStream(
+        src_rate, dst_rate, 1, dtype="int16", quality=RESAMPLE_QUALITY
+    )
+
+    def _resample(data: bytes) -> bytes:
+        return stream.resample_chunk(np.frombuffer(data, dtype=np.int16)).tobytes()
+
+    return _resample
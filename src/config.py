@@ -13,6 +13,7 @@ if AUDIO_DEVICE_INDEX:
         AUDIO_DEVICE_INDEX = int(AUDIO_DEVICE_INDEX)
     except ValueError:
         AUDIO_DEVICE_INDEX = None
+RT_PRIORITY = int(os.getenv("RT_PRIORITY", "0"))  # SCHED_FIFO priority for the mic callback thread; 0 = off
 
 # --- LOGGING ---
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -20,6 +21,7 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 # --- WAKE WORD ---
 WAKE_KEY = os.getenv("WAKE_KEY", "hey_mycroft")
 WAKE_THRESHOLD = float(os.getenv("WAKE_THRESHOLD", "0.7"))
+WAKE_MODEL_PATH = os.getenv("WAKE_MODEL_PATH")  # optional .onnx (e.g. INT8-quantized)
 VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "0.5"))
 SILENCE_SECONDS = float(os.getenv("SILENCE_SECONDS", "1.0"))
 TTS_REARM_DELAY_SEC = float(os.getenv("TTS_REARM_DELAY_SEC", "5.0"))
@@ -1,20 +1,26 @@
 import asyncio
+import collections
 import logging
 import numpy as np
-import subprocess
+import pyaudio
+import queue
+import soundfile
+import sys
 import threading
 import os
-import time
+from dataclasses import dataclass
+from typing import Final, Optional
 
 from openwakeword.model import Model
-from src.config import WAKE_KEY, WAKE_THRESHOLD, FRAME_SIZE
+from src.config import WAKE_KEY, WAKE_THRESHOLD, WAKE_MODEL_PATH, FRAME_SIZE, RT_PRIORITY
 from src.app_state import listen_state
+from src.audio import PCMRing, SPSCRing, make_resampler
 
 # -------------------------
 # Constants
 # -------------------------
 
-READ_CHUNK_SIZE = FRAME_SIZE
+READ_CHUNK_SIZE: Final[int] = FRAME_SIZE
 
 WAKE_SOUND_PATH = os.path.join(
     os.getcwd(),
@@ -22,63 +28,102 @@ WAKE_SOUND_PATH = os.path.join(
     "wakeword-confirmed.mp3",
 )
 
-SAMPLE_RATE = 16000
-SAMPLE_WIDTH = 2  # int16
+SAMPLE_RATE: Final[int] = 16000
+SAMPLE_WIDTH: Final[int] = 2  # int16
 
-WAKE_WINDOW_SEC = 1.0
-WAKE_WINDOW_BYTES = int(SAMPLE_RATE * SAMPLE_WIDTH * WAKE_WINDOW_SEC)
+# openWakeWord streams 80 ms frames and keeps its own feature history,
+# so only new audio is handed to predict()
+WAKE_FRAME_SAMPLES: Final[int] = 1280
 
-PREDICT_EVERY_SEC = 0.2  # 200 ms
-WAKE_COOLDOWN_SEC = 0.6  # feedback suppression
+# Model frames per predict() call: one 160 ms batch halves the per-call
+# overhead (feature/tensor setup, dict return) at 12.5 -> 6 calls/s
+WAKE_PREDICT_FRAMES: Final[int] = 2
+WAKE_PREDICT_SAMPLES: Final[int] = WAKE_FRAME_SAMPLES * WAKE_PREDICT_FRAMES
+WAKE_QUEUE_MAX_FRAMES: Final[int] = 12  # ~2 s backlog before the oldest batches are dropped
+WAKE_COOLDOWN_SEC: Final[float] = 0.6  # feedback suppression (worker-side)
+WAKE_COOLDOWN_BATCHES: Final[int] = -(-int(WAKE_COOLDOWN_SEC * SAMPLE_RATE) // WAKE_PREDICT_SAMPLES)
 
-ENABLE_VOLUME_BAR = os.getenv("ENABLE_VOLUME_BAR", "0") == "1"
+# Batches whose peak stays under this (~-47 dBFS) skip inference; 0 disables
+WAKE_SILENCE_PEAK: Final[int] = int(os.getenv("WAKE_SILENCE_PEAK", "150"))
+
+RAW_RING_SEC: Final[float] = 2.0  # mic backlog before the oldest audio is dropped
+SESSION_MAX_CHUNKS: Final[int] = 256  # 16 kHz chunks buffered for audio_stream()
+
+ENABLE_VOLUME_BAR: Final[bool] = os.getenv("ENABLE_VOLUME_BAR", "0") == "1"
+VOLUME_BAR_STRIDE: Final[int] = 4
+VOLUME_BAR_WIDTH: Final[int] = 30
+VOLUME_BAR_MAX_RMS: Final[int] = 2000
+VOLUME_BAR_REDRAW_SEC: Final[float] = 0.1  # ~10 Hz is plenty for a terminal meter
+
+# Prebuilt bar strings, indexed by fill level
+_VOLUME_BARS = [
+    "█" * i + " " * (VOLUME_BAR_WIDTH - i) for i in range(VOLUME_BAR_WIDTH + 1)
+]
 
 # -------------------------
 # Helpers
 # -------------------------
 
-def rms_int16(frame: bytes) -> int:
-    samples = np.frombuffer(frame, dtype=np.int16)
-    if samples.size == 0:
+def rms_int16(samples: np.ndarray) -> int:
+    # Every 4th sample: same reading for a display, 4x less memory traffic
+    sub = samples[::VOLUME_BAR_STRIDE]
+    if sub.size == 0:
         return 0
-    return int(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
-
-
-def resample_int16(data: bytes, src_rate: int, dst_rate: int) -> bytes:
-    if src_rate == dst_rate:
-        return data
+    return int(np.sqrt(np.mean(sub.astype(np.float32) ** 2)))
 
-    samples = np.frombuffer(data, dtype=np.int16)
-    if samples.size == 0:
-        return data
 
-    duration = samples.size / src_rate
-    target_len = int(duration * dst_rate)
+# Wake sound, decoded once and played in-process (no per-wake subprocess)
+_wake_pcm = b""
+_wake_out = None
 
-    resampled = np.interp(
-        np.linspace(0.0, samples.size, target_len, endpoint=False),
-        np.arange(samples.size),
-        samples,
-    ).astype(np.int16)
 
-    return resampled.tobytes()
+def load_wake_sound(p: pyaudio.PyAudio):
+    global _wake_pcm, _wake_out
 
-
-def play_wake_sound():
     if not os.path.exists(WAKE_SOUND_PATH):
         logging.warning(f"⚠️ Wake sound not found: {WAKE_SOUND_PATH}")
         return
 
     try:
-        subprocess.Popen(
-            ["paplay", WAKE_SOUND_PATH],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+        pcm, rate = soundfile.read(WAKE_SOUND_PATH, dtype="int16", always_2d=True)
+        _wake_out = p.open(
+            format=pyaudio.paInt16,
+            channels=pcm.shape[1],
+            rate=rate,
+            output=True,
         )
+        _wake_pcm = pcm.tobytes()
+    except Exception as e:
+        logging.error(f"⚠️ Failed to load wake sound: {e}")
+
+
+async def play_wake_sound():
+    if _wake_out is None:
+        return
+
+    try:
+        await asyncio.to_thread(_wake_out.write, _wake_pcm)
     except Exception as e:
         logging.error(f"⚠️ Failed to play wake sound: {e}")
 
 
+# Strong refs so beep tasks are not garbage-collected mid-play
+_wake_sound_tasks: set = set()
+
+
+def start_wake_sound():
+    """
+    Play the wake sound in the background. Skipped while a beep is still
+    playing: _wake_out is one stream and must not be written from two threads.
+    """
+    if _wake_sound_tasks:
+        return
+
+    task = asyncio.create_task(play_wake_sound())
+    _wake_sound_tasks.add(task)
+    task.add_done_callback(_wake_sound_tasks.discard)
+
+
 # -------------------------
 # Wake-word model
 # -------------------------
@@ -86,123 +131,418 @@ def play_wake_sound():
 logging.info("Loading Wake Word model...")
 
 try:
-    wake_model = Model(wakeword_models=[WAKE_KEY])
+    # ONNX Runtime backend: openWakeWord pins it to one intra/inter-op
+    # thread, so it never competes with the audio threads
+    wake_model = Model(
+        wakeword_models=[WAKE_MODEL_PATH or WAKE_KEY],
+        inference_framework="onnx",
+    )
 except TypeError:
     logging.warning(
         f"⚠️ Argument mismatch. Loading default models and filtering for {WAKE_KEY}..."
     )
     wake_model = Model()
 
-wake_model_lock = threading.Lock()
+# -------------------------
+# Listener context
+# -------------------------
+
+@dataclass
+class ListenerCtx:
+    """Event-loop handles of the running listen(), shared with audio threads."""
+    loop: asyncio.AbstractEventLoop
+    raw: SPSCRing  # native-rate mic samples from stream_callback
+    chunk_ready: asyncio.Event
+    wake_hit: asyncio.Event
+    session_ready: asyncio.Event
+    wake_score: float = 0.0  # score behind the latest wake_hit
+    session: Optional[collections.deque] = None  # 16 kHz audio for audio_stream()
+
+
+# Registered once per listen(); None while nobody consumes
+_ctx: Optional[ListenerCtx] = None
+
+# Wake events for events(); bounded so an idle consumer cannot pile them up
+_events: asyncio.Queue = asyncio.Queue(maxsize=8)
 
 # -------------------------
-# Listener
+# Wake-word worker thread
 # -------------------------
 
-async def listen(stream, native_rate):
-    logging.info(
-        f"🎙️ Listener running — input={native_rate}Hz → 16kHz | "
-        f"FRAME_SIZE={FRAME_SIZE} | "
-        f"WAKE_WINDOW_BYTES={WAKE_WINDOW_BYTES}"
-    )
+# 160 ms batches from listen(); C-level queue, no asyncio
+_wake_frames: queue.SimpleQueue = queue.SimpleQueue()
 
-    wake_buffer = bytearray()
-    last_predict_time = 0.0
+# Set by listen() when the gate reopens or the energy gate breaks the stream;
+# the worker resets the model itself
+_wake_rearm = threading.Event()
 
-    # 🔒 LOCAL cooldown flag (THIS WAS MISSING)
-    in_wake_cooldown = False
+# Preallocated frame buffers: listen() fills one, the worker hands it back
+_free_frames: queue.SimpleQueue = queue.SimpleQueue()
+for _ in range(WAKE_QUEUE_MAX_FRAMES + 2):
+    _free_frames.put(np.empty(WAKE_PREDICT_SAMPLES, dtype=np.int16))
 
-    while await listen_state.get_listener_running():
-        # -------------------------
-        # Always read audio
-        # -------------------------
-        data = await asyncio.to_thread(
-            stream.read,
-            READ_CHUNK_SIZE,
-            exception_on_overflow=False,
-        )
 
-        # -------------------------
-        # Resample to 16 kHz
-        # -------------------------
-        resampled = resample_int16(
-            data=data,
-            src_rate=native_rate,
-            dst_rate=SAMPLE_RATE,
-        )
+def _acquire_frame() -> np.ndarray:
+    try:
+        return _free_frames.get_nowait()
+    except queue.Empty:
+        # Pool exhausted (worker stalled): fall back to a fresh buffer
+        return np.empty(WAKE_PREDICT_SAMPLES, dtype=np.int16)
+
+
+def _submit_wake_frame(frame: np.ndarray):
+    """Enqueue for the worker, dropping the oldest frame if it falls behind."""
+    if _wake_frames.qsize() >= WAKE_QUEUE_MAX_FRAMES:
+        try:
+            _free_frames.put(_wake_frames.get_nowait())
+            logging.warning("⚠️ Wake-word worker behind — dropped oldest frame")
+        except queue.Empty:
+            pass  # worker drained it meanwhile
+
+    _wake_frames.put_nowait(frame)
+
+
+def _wake_worker():
+    """
+    Sole owner of wake_model: scores frames as they arrive and posts
+    detections back to the listener's event loop.
+    """
+    cooldown = 0  # batches still to skip after a detection
+
+    # Hot-loop locals (LOAD_FAST instead of global/attribute lookups)
+    get_frame = _wake_frames.get
+    release_frame = _free_frames.put
+    predict = wake_model.predict
+    reset = wake_model.reset
+    rearm = _wake_rearm
+    wake_key = WAKE_KEY
+    wake_threshold = WAKE_THRESHOLD
+
+    while True:
+        frame = get_frame()
+
+        # 🧹 Re-armed after a session or a gated silent gap: forget the
+        # non-adjacent audio history. Checked first so a cooldown from the
+        # last hit (no batches arrive while gated) cannot swallow new speech
+        if rearm.is_set():
+            rearm.clear()
+            reset()
+            cooldown = 0
+
+        # Cooldown counted in audio batches: no clock reads, no inference
+        if cooldown:
+            cooldown -= 1
+            release_frame(frame)
+            continue
 
-        # ✅ ALWAYS yield audio
-        yield resampled
-
-        # -------------------------
-        # Volume diagnostics
-        # -------------------------
-        if ENABLE_VOLUME_BAR:
-            rms = rms_int16(resampled)
-            filled = int(min(rms, 2000) / 2000 * 30)
-
-            print(
-                f"\r\033[K"
-                f"🔊 RMS:{rms:5d} |{'█' * filled:<30} "
-                f"BUF:{len(wake_buffer):6d}/{WAKE_WINDOW_BYTES}",
-                end="",
-                flush=True,
-            )
-
-        # -------------------------
-        # Wake-word detection ONLY if allowed
-        # -------------------------
-        if not await listen_state.get_global_wake_word():
+        try:
+            score = predict(frame).get(wake_key, 0.0)
+        except Exception as e:
+            logging.error(f"❌ Wake-word inference failed: {e}")
             continue
+        finally:
+            # openWakeWord copies into its own history; buffer is free again
+            release_frame(frame)
+
+        if score >= wake_threshold:
+            cooldown = WAKE_COOLDOWN_BATCHES
+
+            # 🧹 Reset model state so the wake sound cannot retrigger
+            reset()
+
+            ctx = _ctx
+            if ctx is not None:
+                ctx.wake_score = score
+                try:
+                    ctx.loop.call_soon_threadsafe(ctx.wake_hit.set)
+                except RuntimeError:
+                    pass  # event loop closed
+
 
-        # -------------------------
-        # Overwrite-only buffer
-        # -------------------------
-        wake_buffer.extend(resampled)
-        if len(wake_buffer) > WAKE_WINDOW_BYTES:
-            wake_buffer[:] = wake_buffer[-WAKE_WINDOW_BYTES:]
+threading.Thread(target=_wake_worker, name="wake-word", daemon=True).start()
 
-        # -------------------------
-        # Cadenced prediction
-        # -------------------------
-        now = time.monotonic()
+# -------------------------
+# Mic input (PortAudio callback)
+# -------------------------
+
+
+# Applied once, from the first callback, to PortAudio's thread only
+_rt_pending = RT_PRIORITY > 0
+
+
+def _enable_realtime_scheduling(priority: int):
+    """
+    Move the calling (PortAudio callback) thread to SCHED_FIFO. The event
+    loop, worker threads and child processes stay SCHED_OTHER.
+    """
+    try:
+        policy = os.SCHED_FIFO | getattr(os, "SCHED_RESET_ON_FORK", 0)
+        os.sched_setscheduler(0, policy, os.sched_param(priority))
+        logging.info(f"⏱️ Real-time audio callback enabled (SCHED_FIFO {priority})")
+    except (AttributeError, OSError):
+        logging.warning(
+            "⚠️ RT scheduling unavailable; run as root or grant CAP_SYS_NICE "
+            "(setcap cap_sys_nice+ep <python>) for lower latency"
+        )
+
+
+def stream_callback(in_data, frame_count, time_info, status):
+    """
+    PyAudio input callback (PortAudio's own thread): copies the chunk into
+    the listener's SPSC ring and wakes listen(), with no blocking reader thread.
+    """
+    global _rt_pending
+
+    if _rt_pending:
+        _rt_pending = False
+        _enable_realtime_scheduling(RT_PRIORITY)
+
+    ctx = _ctx
+
+    # Listener paused (TTS playing) or not started: discard
+    if ctx is not None and listen_state.listener_running:
+        ctx.raw.write(np.frombuffer(in_data, dtype=np.int16))
+        try:
+            ctx.loop.call_soon_threadsafe(ctx.chunk_ready.set)
+        except RuntimeError:
+            pass  # event loop closed
+
+    return (None, pyaudio.paContinue)
+
+
+# -------------------------
+# Listener
+# -------------------------
 
-        if (
-            len(wake_buffer) == WAKE_WINDOW_BYTES
-            and now - last_predict_time >= PREDICT_EVERY_SEC
-        ):
-            last_predict_time = now
+async def events():
+    """Yield "START_SESSION" once per wake word; no audio passes through here."""
+    while True:
+        yield await _events.get()
 
-            frame = np.frombuffer(bytes(wake_buffer), dtype=np.int16)
 
-            def _predict():
-                with wake_model_lock:
-                    return wake_model.predict(frame)
+def drain_events():
+    """Drop queued wake events (stale once a session starts or ends)."""
+    while not _events.empty():
+        _events.get_nowait()
 
-            scores = await asyncio.to_thread(_predict)
-            score = scores.get(WAKE_KEY, 0.0)
 
-            if score >= WAKE_THRESHOLD and not in_wake_cooldown:
+async def audio_stream():
+    """
+    Yield 16 kHz audio captured since the last wake word. Closing the
+    generator ends the session; later audio is no longer buffered.
+    """
+    ctx = _ctx
+    if ctx is None or ctx.session is None:
+        return
+
+    session = ctx.session
+    ready = ctx.session_ready
+
+    try:
+        while True:
+            while not session:
+                ready.clear()
+                await ready.wait()
+            yield session.popleft()
+    finally:
+        if ctx.session is session:
+            ctx.session = None
+
+
+async def listen(native_rate):
+    """
+    Capture loop: resampling, wake-word hand-off and session audio routing.
+    Runs as a background task for the lifetime of the stream.
+    """
+    global _ctx
+
+    logging.info(
+        f"🎙️ Listener running — input={native_rate}Hz → 16kHz | "
+        f"FRAME_SIZE={FRAME_SIZE} | "
+        f"WAKE_PREDICT_SAMPLES={WAKE_PREDICT_SAMPLES}"
+    )
+
+    ctx = ListenerCtx(
+        loop=asyncio.get_running_loop(),
+        raw=SPSCRing(int(native_rate * RAW_RING_SEC)),
+        chunk_ready=asyncio.Event(),
+        wake_hit=asyncio.Event(),
+        session_ready=asyncio.Event(),
+    )
+
+    # Fixed native → 16 kHz converter; 16 kHz devices bypass it entirely
+    needs_resample = native_rate != SAMPLE_RATE
+    resample = make_resampler(native_rate, SAMPLE_RATE) if needs_resample else None
+
+    # Staging ring for frame hand-off, overwritten in place. It only has to
+    # hold one partial frame plus one chunk, so it stays cache-resident
+    chunk_samples = -(-READ_CHUNK_SIZE * SAMPLE_RATE // native_rate)
+    wake_ring = PCMRing(2 * (WAKE_PREDICT_SAMPLES + chunk_samples))
+    pending = 0  # samples written but not yet sent to the worker
+
+    # Gate state seen on the previous chunk (edge-detects re-arming)
+    armed = True
+
+    # Mic samples from stream_callback, read out one chunk at a time
+    raw = ctx.raw
+    read_buf = np.empty(READ_CHUNK_SIZE, dtype=np.int16)
+    _ctx = ctx
+
+    # Hot-loop locals (LOAD_FAST instead of global/attribute lookups)
+    state = listen_state
+    read_into = raw.read_into
+    chunk_ready = ctx.chunk_ready
+    wake_hit = ctx.wake_hit
+    session_ready = ctx.session_ready
+    post_event = _events.put_nowait
+    frombuffer = np.frombuffer
+    int16 = np.int16
+    submit = _submit_wake_frame
+    acquire = _acquire_frame
+    frame_samples = WAKE_PREDICT_SAMPLES
+    silence_peak = WAKE_SILENCE_PEAK
+    mark_gap = _wake_rearm.set
+    gated = False  # last batch was dropped by the energy gate
+    volume_bar = ENABLE_VOLUME_BAR
+    bar_every = max(1, round(VOLUME_BAR_REDRAW_SEC * native_rate / READ_CHUNK_SIZE))
+    bar_countdown = 0
+
+    try:
+        while True:
+            # -------------------------
+            # Always read audio
+            # -------------------------
+            while not raw:
+                chunk_ready.clear()
+                await chunk_ready.wait()
+            n = read_into(read_buf)
+
+            # -------------------------
+            # Resample to 16 kHz
+            # -------------------------
+            chunk = read_buf[:n]
+            resampled = resample(chunk) if needs_resample else chunk.tobytes()
+
+            # ✅ Route audio to the open session, if any
+            session = ctx.session
+            if session is not None:
+                session.append(resampled)
+                session_ready.set()
+
+            # One int16 view shared by diagnostics and the wake ring
+            samples = frombuffer(resampled, dtype=int16)
+
+            # -------------------------
+            # Volume diagnostics
+            # -------------------------
+            if volume_bar:
+                if bar_countdown:
+                    bar_countdown -= 1
+                else:
+                    bar_countdown = bar_every - 1
+                    rms = rms_int16(samples)
+                    filled = min(rms, VOLUME_BAR_MAX_RMS) * VOLUME_BAR_WIDTH // VOLUME_BAR_MAX_RMS
+
+                    sys.stdout.write(
+                        f"\r\033[K"
+                        f"🔊 RMS:{rms:5d} |{_VOLUME_BARS[filled]} "
+                        f"BUF:{pending:6d}/{WAKE_PREDICT_SAMPLES}"
+                    )
+                    sys.stdout.flush()
+
+            # -------------------------
+            # Wake-word detection ONLY if allowed
+            # -------------------------
+            if not state.global_wake_allowed:
+                # Drop hits scored from audio queued before the session began
+                wake_hit.clear()
+                armed = False
+                continue
+
+            if not armed:
+                armed = True
+                _wake_rearm.set()
+
+                # 🧹 Flush audio buffered while the session ran (command tail,
+                # TTS echo): drop it in memory instead of scoring it
+                raw.clear()
+                wake_ring.clear()
+                pending = 0
+
+                # A session must never outlive the gate: drop any buffer
+                # and wake events left from it so they cannot be replayed
+                ctx.session = None
+                drain_events()
+                continue
+
+            # -------------------------
+            # Overwrite-only ring buffer
+            # -------------------------
+            wake_ring.write(samples)
+            pending += samples.size
+
+            # -------------------------
+            # Detection posted by the worker
+            # -------------------------
+            if wake_hit.is_set():
+                wake_hit.clear()
+                score = ctx.wake_score
+
+                # 🔔 Play wake sound alongside capture; the mic keeps recording
+                # from the detection point instead of after the beep
+                start_wake_sound()
+
                 # Break the volume bar line
-                if ENABLE_VOLUME_BAR:
-                    print("", flush=True)
+                if volume_bar:
+                    sys.stdout.write("\n")
 
                 logging.info(
                     f"🔔 Wake word detected "
-                    f"(score={score:.3f}, window={WAKE_WINDOW_SEC:.1f}s)"
+                    f"(score={score:.3f})"
                 )
 
-                in_wake_cooldown = True
-
-                # 🔔 Play wake sound
-                play_wake_sound()
-
                 # 🧹 Reset buffers so sound cannot retrigger
-                wake_buffer.clear()
-                wake_model.reset()
-                last_predict_time = 0.0
+                wake_ring.clear()
+                pending = 0
 
-                # 🚀 Signal main loop
-                yield "START_SESSION"
+                # 🎙️ Buffer command audio from here on, before main_loop
+                # even sees the event
+                ctx.session = collections.deque(maxlen=SESSION_MAX_CHUNKS)
 
-                in_wake_cooldown = False
+                # 🚀 Signal main loop
+                try:
+                    post_event("START_SESSION")
+                except asyncio.QueueFull:
+                    logging.warning("⚠️ Wake event dropped — main loop not consuming")
+                continue
+
+            # -------------------------
+            # Incremental 160 ms batches (handed off, never awaited)
+            # -------------------------
+            if pending >= frame_samples:
+                window = wake_ring.view()
+
+                while pending >= frame_samples:
+                    start = wake_ring.size - pending
+                    batch = window[start:start + frame_samples]
+                    pending -= frame_samples
+
+                    # Energy gate: near-silent batches never reach the model.
+                    # Trade-off: the next loud batch is not adjacent to the
+                    # model's history, so the first gated batch of a run marks
+                    # a gap and the worker resets that history (equivalent to
+                    # silence, which is what was skipped) instead of splicing
+                    # pre-silence audio onto new speech
+                    if silence_peak and -silence_peak < batch.min() and batch.max() < silence_peak:
+                        if not gated:
+                            gated = True
+                            mark_gap()
+                        continue
+                    gated = False
+
+                    # Pooled copy: the ring keeps being written while the worker predicts
+                    frame = acquire()
+                    frame[:] = batch
+                    submit(frame)
+    finally:
+        _ctx = None
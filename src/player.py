@@ -1,10 +1,13 @@
-import json
 import asyncio
+import errno
+import functools
+import os
 import time
 import logging
 import subprocess
 import shutil
 import socket
+import orjson
 import websockets
 
 from src.config import (
@@ -21,25 +24,56 @@ from src.speaker import speak
 _CLIENTS: set = set()
 
 
+def _encode(payload: dict) -> str:
+    # str, not bytes: websockets sends bytes as a binary frame, and the
+    # extension JSON.parse()s text frames
+    return orjson.dumps(payload).decode()
+
+
+# Fixed-shape extension messages, encoded once
+MSG_REQUEST_STATE = _encode({"action": "request_state"})
+MSG_PLAY = _encode({"action": "play"})
+MSG_PAUSE = _encode({"action": "pause"})
+MSG_NEXT = _encode({"action": "next"})
+
+
 # -----------------------
 # Utility helpers
 # -----------------------
 
 def is_port_in_use(host: str, port: int) -> bool:
+    # Local bind probe: fails immediately with EADDRINUSE, no TCP handshake.
+    # SO_REUSEADDR (as websockets.serve uses) ignores TIME_WAIT leftovers
+    # from a previous run, so only a live listener counts as "in use".
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex((host, port)) == 0
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind((host, port))
+        except OSError as e:
+            if e.errno == errno.EADDRINUSE:
+                return True
+            raise  # e.g. EACCES (port < 1024), EADDRNOTAVAIL (bad WS_HOST)
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def _brave_on_path() -> bool:
+    return shutil.which("brave-browser") is not None
 
 
 def is_brave_running() -> bool:
-    try:
-        # Check for both the script name and the binary name
-        subprocess.check_output(
-            ["pgrep", "-f", "brave"],
-            stderr=subprocess.DEVNULL,
-        )
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    # Scan /proc in-process instead of forking pgrep; the comm name covers
+    # both the brave-browser launcher script and the brave binary
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/comm", "rb") as f:
+                if f.read().startswith(b"brave"):
+                    return True
+        except OSError:
+            continue  # process exited mid-scan
+    return False
 
 
 def ensure_brave_running() -> bool:
@@ -50,7 +84,7 @@ def ensure_brave_running() -> bool:
         True  -> Brave was launched by this call
         False -> Brave was already running
     """
-    if not shutil.which("brave-browser"):
+    if not _brave_on_path():
         logging.error("❌ Brave browser not found in PATH")
         return False
 
@@ -77,6 +111,22 @@ def ensure_brave_running() -> bool:
         return False
 
 
+async def _ensure_browser():
+    # A connected extension means Brave is up: skip the pgrep/Popen probe,
+    # and never fork from the event loop thread
+    if browser_state.connected:
+        return
+    await asyncio.to_thread(ensure_brave_running)
+
+
+async def prewarm_browser():
+    """
+    Launch Brave in the background at startup so the extension is already
+    connected when the first command arrives.
+    """
+    await _ensure_browser()
+
+
 # -----------------------
 # WebSocket server
 # -----------------------
@@ -90,7 +140,7 @@ async def _ws_handler(ws):
         async for message in ws:
             logging.debug(f"📥 Received from WS: {message[:100]}...")
             try:
-                data = json.loads(message)
+                data = orjson.loads(message)
                 if data.get("type") == "STATE_UPDATE":
                     new_state = data.get("state", {})
                     await browser_state.update(ready=True, **new_state)
@@ -101,7 +151,7 @@ async def _ws_handler(ws):
                     logging.info("📊 Received CONTENT_READY (YouTube tab confirmed)")
                 else:
                     logging.warning(f"❓ Unknown message type: {data.get('type')}")
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 logging.error("❌ Failed to decode JSON message")
     except Exception as e:
         logging.error(f"❌ WS Handler error: {e}")
@@ -132,7 +182,7 @@ async def start_ws_server(host=WS_HOST, port=WS_PORT):
 
 async def request_browser_state():
     """Ask the extension to report its current state."""
-    await _broadcast({"action": "request_state"})
+    await _broadcast(MSG_REQUEST_STATE)
 
 
 async def wait_for_ready(timeout=60, needs_youtube=False):
@@ -143,6 +193,7 @@ async def wait_for_ready(timeout=60, needs_youtube=False):
     logging.info(f"⏳ Waiting for ready (needs_youtube={needs_youtube})...")
     call_time = time.time()
     start_time = asyncio.get_event_loop().time()
+    last_request = None
     warned = False
 
     while True:
@@ -169,26 +220,27 @@ async def wait_for_ready(timeout=60, needs_youtube=False):
         if state["connected"]:
             # Reduce frequency of requests to avoid overwhelming the extension
             # Request state immediately and then every 2 seconds
-            if elapsed < 1.0 or int(elapsed) % 2 == 0:
+            if last_request is None or elapsed - last_request >= 2.0:
                 logging.debug("📡 Requesting browser state...")
                 await request_browser_state()
+                last_request = elapsed
 
-        await asyncio.sleep(1.0)
+        # Re-check as soon as the extension reports back (1s fallback)
+        await browser_state.wait_for_update(timeout=1.0)
 
 
 # -----------------------
 # Broadcast helper
 # -----------------------
 
-async def _broadcast(payload: dict):
+async def _broadcast(msg: str):
+    """Send an already-encoded JSON message to every connected client."""
     if not _CLIENTS:
         return
 
-    msg = json.dumps(payload)
-    await asyncio.gather(
-        *(ws.send(msg) for ws in _CLIENTS),
-        return_exceptions=True,
-    )
+    # Frames the message once and writes it to every open connection
+    # without a task per client; closed or failing clients are skipped
+    websockets.broadcast(_CLIENTS, msg)
 
 
 # -----------------------
@@ -196,30 +248,30 @@ async def _broadcast(payload: dict):
 # -----------------------
 
 async def search_and_play(query: str):
-    ensure_brave_running()
+    await _ensure_browser()
     if await wait_for_ready(needs_youtube=False):
-        await _broadcast({"action": "search", "query": query})
+        await _broadcast(_encode({"action": "search", "query": query}))
     else:
         logging.error("❌ Search failed: Browser not ready")
 
 
 async def play():
-    ensure_brave_running()
+    await _ensure_browser()
     if await wait_for_ready(needs_youtube=True):
-        await _broadcast({"action": "play"})
+        await _broadcast(MSG_PLAY)
     else:
         logging.error("❌ Play failed: YouTube not ready")
 
 
 async def pause():
-    if not is_brave_running():
+    if not browser_state.connected and not await asyncio.to_thread(is_brave_running):
         return
 
     if await wait_for_ready(needs_youtube=True):
-        await _broadcast({"action": "pause"})
+        await _broadcast(MSG_PAUSE)
 
 
 async def next_track():
-    ensure_brave_running()
+    await _ensure_browser()
     if await wait_for_ready(needs_youtube=True):
-        await _broadcast({"action": "next"})
+        await _broadcast(MSG_NEXT)
@@ -1,13 +1,18 @@
 import asyncio
+import functools
 import json
 import logging
 import os
-import io
-import wave
+import re
+import struct
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Optional
 import numpy as np
-import torch
+import orjson
 from google import genai
 from google.genai import types
+from silero_vad import load_silero_vad
 
 from src.config import (
     COMMAND_TIMEOUT,
@@ -24,15 +29,7 @@ from src.app_state import listen_state
 
 LOCATION = os.getenv("GCP_REGION", "us-central1")
 MODEL_ID = os.getenv("VERTEX_MODEL_NAME", MODEL_NAME)
-SILENCE_THRESHOLD_MS = int(float(SILENCE_SECONDS) * 1000)
-
-logging.debug("Loading Silero VAD in reasoner...")
-vad_model, _ = torch.hub.load(
-    repo_or_dir="snakers4/silero-vad",
-    model="silero_vad",
-    force_reload=False,
-    trust_repo=True,
-)
+SILENCE_THRESHOLD_SEC = float(SILENCE_SECONDS)
 
 # -----------------------
 # AEC-safe VAD parameters
@@ -41,8 +38,144 @@ vad_model, _ = torch.hub.load(
 NOISE_ALPHA = 0.95          # slow adaptation
 SILENCE_RELATIVE_K = 1.4    # silence = near noise floor
 
+VAD_BLOCK_BYTES = 1024      # 512 int16 samples @ 16 kHz
+VAD_BLOCK_SAMPLES = VAD_BLOCK_BYTES // 2
+
+# -----------------------
+# LLM request / response
+# -----------------------
+
+# Task prompt, built once and shared by every request
+TASK_PART = types.Part(
+    text=(
+        "You are a voice assistant.\n"
+        "The user speaks either English or Spanish.\n\n"
+        "Tasks:\n"
+        "1) Transcribe the audio exactly.\n"
+        "2) Infer the user's intent.\n\n"
+        "Return STRICT JSON with this shape:\n"
+        "{\n"
+        "  \"transcript\": string,\n"
+        "  \"language\": \"en\" | \"es\",\n"
+        "  \"intent\": string,\n"
+        "  \"filter\": string | null,\n"
+        "  \"feedback\": string | null,\n"
+        "  \"confidence\": number\n"
+        "}\n"
+    )
+)
+
+# Markdown code fences the model sometimes wraps JSON in
+JSON_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+@dataclass(slots=True, frozen=True)
+class Intent:
+    """Parsed LLM reply for one voice command."""
+    kind: str
+    filter: Optional[str] = None
+    feedback: Optional[str] = None
+    language: str = "en"
+
+    @classmethod
+    def from_reply(cls, data: dict) -> "Intent":
+        return cls(
+            kind=data.get("intent") or "",
+            filter=data.get("filter"),
+            feedback=data.get("feedback"),
+            language=data.get("language") or "en",
+        )
+
+
+# 44-byte RIFF/WAVE header for 16 kHz mono int16; sizes patched per request
+WAV_HEADER_BYTES = 44
+WAV_HEADER = struct.pack(
+    "<4sI4s4sIHHIIHH4sI",
+    b"RIFF", 36, b"WAVE",
+    b"fmt ", 16, 1, 1, 16000, 16000 * 2, 2, 16,
+    b"data", 0,
+)
+
+
+def wav_finalize(buf: bytearray) -> bytearray:
+    """Patch sizes into a WAV_HEADER-prefixed PCM buffer, in place."""
+    size = len(buf) - WAV_HEADER_BYTES
+    struct.pack_into("<I", buf, 4, 36 + size)
+    struct.pack_into("<I", buf, 40, size)
+    return buf
+
+
+# -----------------------
+# Silero VAD (ONNX Runtime)
+# -----------------------
+
+class SileroVAD:
+    """
+    Runs Silero VAD straight through its ONNX Runtime session.
+
+    Skips the torch wrapper's per-call tensor construction and dispatch:
+    input, recurrent state and sample-rate arrays are allocated once and
+    each block is scaled into the input buffer in place.
+
+    The model is recurrent, so consecutive blocks cannot share one batched
+    forward pass; instead a single call walks every ready block in order
+    and returns one probability per block.
+    """
+
+    CONTEXT_SAMPLES = 64  # Silero v5 prepends 64 samples of context @ 16 kHz
+    INT16_SCALE = np.float32(1.0 / 32768.0)
+
+    def __init__(self, session):
+        self._session = session
+        self._input = np.zeros(
+            (1, self.CONTEXT_SAMPLES + VAD_BLOCK_SAMPLES), dtype=np.float32
+        )
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._sr = np.array(16000, dtype=np.int64)
+
+    def reset(self):
+        self._input.fill(0.0)
+        self._state.fill(0.0)
+
+    def __call__(self, pcm) -> np.ndarray:
+        blocks = np.frombuffer(pcm, dtype=np.int16).reshape(-1, VAD_BLOCK_SAMPLES)
+        probs = np.empty(len(blocks), dtype=np.float32)
+
+        buf = self._input[0]
+        run = self._session.run
+
+        for i, block in enumerate(blocks):
+            # Tail of the previous block becomes this block's context
+            buf[:self.CONTEXT_SAMPLES] = buf[-self.CONTEXT_SAMPLES:]
+            np.multiply(block, self.INT16_SCALE, out=buf[self.CONTEXT_SAMPLES:])
 
-def get_system_instruction():
+            out, self._state = run(
+                None,
+                {"input": self._input, "state": self._state, "sr": self._sr},
+            )
+            probs[i] = out[0, 0]
+
+        return probs
+
+
+logging.debug("Loading Silero VAD in reasoner...")
+# Packaged ONNX weights: no torch.hub cache / network check or repo import
+vad_model = SileroVAD(load_silero_vad(onnx=True).session)
+
+
+@functools.lru_cache(maxsize=1)
+def get_genai_client() -> genai.Client:
+    """One client per process: its HTTP connection pool and auth are reused."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if api_key:
+        return genai.Client(api_key=api_key)
+
+    return genai.Client(
+        project=PROJECT_ID,
+        location=LOCATION,
+    )
+
+
+def load_system_instruction() -> str:
     try:
         # Get path relative to project root (main.py's location)
         prompt_path = os.path.join(os.getcwd(), "docs", "PROMPT.md")
@@ -52,7 +185,11 @@ def get_system_instruction():
         return "You are a helpful assistant."
 
 
-async def process_voice_command(audio_gen):
+# Read at import, before the event loop starts, so no command blocks on it
+SYSTEM_INSTRUCTION = load_system_instruction()
+
+
+async def process_voice_command(audio_gen) -> Optional[Intent]:
     """
     Consume audio AFTER wake word.
     Start recording on first detected speech.
@@ -63,19 +200,11 @@ async def process_voice_command(audio_gen):
     # -----------------------
     # Client setup
     # -----------------------
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if api_key:
-        client = genai.Client(api_key=api_key)
-    else:
-        client = genai.Client(
-            project=PROJECT_ID,
-            location=LOCATION,
-        )
-
-    system_instruction = get_system_instruction()
+    client = get_genai_client()
 
-    frames: list[bytes] = []
-    vad_buffer = b""
+    # Captured utterance, appended in place behind its WAV header
+    audio = bytearray(WAV_HEADER)
+    vad_buffer = bytearray()
 
     speaking = False
     silence_start = None
@@ -83,19 +212,19 @@ async def process_voice_command(audio_gen):
     # 🔊 Adaptive noise floor (VAD probability)
     noise_floor = None
 
+    # Fresh recurrent state per command
+    vad_model.reset()
+
     # ⏱️ Start timeout clock
-    loop = asyncio.get_running_loop()
-    start_time = loop.time()
+    now = asyncio.get_running_loop().time
+    start_time = now()
 
     logging.info("👂 Listening for command (reasoner)...")
 
     async for chunk in audio_gen:
-        if isinstance(chunk, str):
-            continue
-
         # ⛔ Timeout: no speech detected
         if not speaking:
-            elapsed = loop.time() - start_time
+            elapsed = now() - start_time
             if elapsed > COMMAND_TIMEOUT:
                 logging.warning(
                     f"⏱️ No speech detected after "
@@ -103,22 +232,26 @@ async def process_voice_command(audio_gen):
                 )
                 return None
 
-        vad_buffer += chunk
+        vad_buffer.extend(chunk)
+
+        ready = len(vad_buffer) // VAD_BLOCK_BYTES * VAD_BLOCK_BYTES
+        if not ready:
+            continue
 
-        while len(vad_buffer) >= 1024:
-            block = vad_buffer[:1024]
-            vad_buffer = vad_buffer[1024:]
+        # One copy out of the bytearray (a plain slice would copy twice)
+        pcm = bytes(memoryview(vad_buffer)[:ready])
+        del vad_buffer[:ready]
+        pcm_view = memoryview(pcm)
 
-            audio = (
-                np.frombuffer(block, dtype=np.int16)
-                .astype(np.float32)
-                / 32768.0
-            )
+        # One VAD call for every complete block in this chunk
+        try:
+            probs = vad_model(pcm).tolist()
+        except Exception:
+            probs = [0.0] * (ready // VAD_BLOCK_BYTES)
 
-            try:
-                prob = vad_model(torch.from_numpy(audio), 16000).item()
-            except Exception:
-                prob = 0.0
+        for i, prob in enumerate(probs):
+            # Zero-copy block view; copied only if it joins the utterance
+            block = pcm_view[i * VAD_BLOCK_BYTES:(i + 1) * VAD_BLOCK_BYTES]
 
             # -----------------------
             # Initialize noise floor
@@ -134,7 +267,7 @@ async def process_voice_command(audio_gen):
                     logging.info("🗣️ Speech started")
                 speaking = True
                 silence_start = None
-                frames.append(block)
+                audio += block
                 continue
 
             # -----------------------
@@ -150,15 +283,13 @@ async def process_voice_command(audio_gen):
             # -----------------------
             # Relative silence detection (AEC-safe)
             # -----------------------
-            frames.append(block)
+            audio += block
 
             if prob < noise_floor * SILENCE_RELATIVE_K:
                 if silence_start is None:
-                    silence_start = loop.time()
+                    silence_start = now()
 
-                elapsed = (loop.time() - silence_start) * 1000
-
-                if elapsed > SILENCE_THRESHOLD_MS:
+                if now() - silence_start > SILENCE_THRESHOLD_SEC:
                     logging.info("🛑 Silence detected. Processing...")
                     break
             else:
@@ -169,59 +300,48 @@ async def process_voice_command(audio_gen):
 
         break  # silence detected
 
-    if not frames:
+    if len(audio) == WAV_HEADER_BYTES:
         logging.warning("⚠️ No speech captured.")
         return None
 
-    audio_bytes = b"".join(frames)
-
     logging.info("🤔 Transcribing + inferring intent...")
 
     try:
-        with io.BytesIO() as wav_buffer:
-            with wave.open(wav_buffer, "wb") as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(16000)
-                wf.writeframes(audio_bytes)
-
-            response = await client.aio.models.generate_content(
-                model=MODEL_ID,
-                contents=[
-                    types.Part(
-                        text=(
-                            "You are a voice assistant.\n"
-                            "The user speaks either English or Spanish.\n\n"
-                            "Tasks:\n"
-                            "1) Transcribe the audio exactly.\n"
-                            "2) Infer the user's intent.\n\n"
-                            "Return STRICT JSON with this shape:\n"
-                            "{\n"
-                            "  \"transcript\": string,\n"
-                            "  \"language\": \"en\" | \"es\",\n"
-                            "  \"intent\": string,\n"
-                            "  \"filter\": string | null,\n"
-                            "  \"feedback\": string | null,\n"
-                            "  \"confidence\": number\n"
-                            "}\n"
-                        )
-                    ),
-                    types.Part(
-                        inline_data=types.Blob(
-                            data=wav_buffer.getvalue(),
-                            mime_type="audio/wav",
-                        )
-                    ),
-                ],
-                config=types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                    response_mime_type="application/json",
+        # Stream the reply and stop reading once the JSON object is complete
+        stream = await client.aio.models.generate_content_stream(
+            model=MODEL_ID,
+            contents=[
+                TASK_PART,
+                types.Part(
+                    inline_data=types.Blob(
+                        data=wav_finalize(audio),
+                        mime_type="audio/wav",
+                    )
                 ),
-            )
+            ],
+            config=types.GenerateContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION,
+                response_mime_type="application/json",
+            ),
+        )
+
+        parts: list[str] = []
+        data = None
+
+        # Closing on early exit releases the HTTP stream / connection now
+        async with aclosing(stream):
+            async for chunk in stream:
+                parts.append(chunk.text or "")
+
+                if parts[-1].rstrip().endswith(("}", "```")):
+                    try:
+                        data = orjson.loads(JSON_FENCE_RE.sub("", "".join(parts)))
+                        break
+                    except orjson.JSONDecodeError:
+                        continue  # a nested object closed, not the reply
 
-        raw = response.text or ""
-        clean = raw.replace("```json", "").replace("```", "").strip()
-        data = json.loads(clean)
+        if data is None:
+            data = orjson.loads(JSON_FENCE_RE.sub("", "".join(parts)))
 
         transcript = data.get("transcript")
         if transcript:
@@ -230,7 +350,7 @@ async def process_voice_command(audio_gen):
         logging.debug("✅ Parsed JSON:")
         logging.debug(json.dumps(data, indent=2))
 
-        return data
+        return Intent.from_reply(data)
 
     except Exception as e:
         logging.error(f"❌ LLM error: {e}")
@@ -79,6 +79,8 @@ async def _play_wav(audio: bytes):
             stderr=asyncio.subprocess.DEVNULL,
         )
 
+        # EOF makes aplay flush the partial period and drain the device,
+        # so wait() returns only once the utterance has finished playing
         proc.stdin.write(audio)
         await proc.stdin.drain()
         proc.stdin.close()
@@ -96,14 +98,18 @@ async def speak(text: Optional[str], language: str = "en"):
     """
     Speak text safely:
     - pauses listener
-    - blocks wake word
+    - blocks wake word (restored to its prior state)
     - guarantees cleanup
     """
     if not text:
         return
 
-    await listen_state.block_listener()
-    await listen_state.block_global_wake_word()
+    # Restore rather than force open: mid-session prompts and feedback
+    # must leave the wake gate closed until main_loop re-arms it
+    wake_was_allowed = listen_state.global_wake_allowed
+
+    listen_state.block_listener()
+    listen_state.block_global_wake_word()
 
     try:
         # Generate audio
@@ -117,5 +123,6 @@ async def speak(text: Optional[str], language: str = "en"):
         logging.warning(f"⚠️ Speaker error (ignored): {e}")
 
     finally:
-        await listen_state.allow_listener()
-        await listen_state.allow_global_wake_word()
+        listen_state.allow_listener()
+        if wake_was_allowed:
+            listen_state.allow_global_wake_word()